@@ -1,13 +1,37 @@
 #!/usr/bin/env python3
 import argparse
+import concurrent.futures
+import gzip
+import hashlib
 import ipaddress
 import json
 import os
 import re
+import shutil
 import sys
+import tarfile
+import tempfile
+from datetime import datetime, timedelta, timezone
+from http.client import HTTPException, HTTPResponse, HTTPSConnection
 from pathlib import Path
-from typing import Iterable, List, Optional, Tuple
-from urllib.request import urlopen
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+try:
+    # Optional Rust-backed parser, considerably faster than stdlib json on
+    # the ~30MB ServiceTags blob; takes bytes directly (no decode step).
+    import orjson
+
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+try:
+    # Optional streaming parser; lets tags be consumed one at a time
+    # without ever materializing the full document.
+    import ijson
+except ImportError:
+    ijson = None
 
 # Microsoft "Azure IP Ranges and Service Tags – Public Cloud" download page
 DETAILS_URL = "https://www.microsoft.com/en-us/download/details.aspx?id=56519"
@@ -15,8 +39,23 @@ CONFIRM_URL = "https://www.microsoft.com/en-us/download/confirmation.aspx?id=565
 
 # Look for the direct JSON download link, e.g.
 # https://download.microsoft.com/download/.../ServiceTags_Public_20251117.json
-JSON_URL_PATTERN = (
-    r"https://download\.microsoft\.com/download/[^\"]*ServiceTags_Public_[0-9]+\.json"
+# Compiled once at import; the narrow character class keeps the scan over the
+# (large) download-page HTML from crawling past quotes or whitespace.
+_JSON_URL_RE = re.compile(
+    r"https://download\.microsoft\.com/download/[^\"\s]*ServiceTags_Public_[0-9]+\.json"
+)
+
+# The top-level changeNumber is the first key in the weekly file, so a scan
+# of the first few KB finds it without parsing the whole document.
+_CHANGE_NUMBER_RE = re.compile(rb'"changeNumber"\s*:\s*([0-9]+)')
+
+# Microsoft publishes the weekly file on Mondays at a stable path, so the
+# URL can usually be constructed directly instead of scraped out of the
+# download-page HTML.
+DIRECT_URL_TEMPLATE = (
+    "https://download.microsoft.com/download/"
+    "7/1/D/71D86715-5596-4529-9B13-DA13A5DE5B63/"
+    "ServiceTags_Public_{stamp}.json"
 )
 DEFAULT_URL_BASE = os.environ.get("EDL_URL_BASE")  # Optional override via env for CI
 
@@ -36,31 +75,118 @@ def compute_default_url_base() -> str:
     )
 
 
+# Keep-alive connections, one per host, reused across requests so the
+# details page, confirmation page and JSON download don't each pay a fresh
+# TCP+TLS handshake.
+_connections: Dict[str, HTTPSConnection] = {}
+
+
+def _http_get(
+    url: str,
+    headers: Optional[Dict[str, str]] = None,
+    max_redirects: int = 5,
+    method: str = "GET",
+) -> HTTPResponse:
+    """
+    Fetch a URL over a cached per-host HTTPSConnection, following redirects.
+    Returns the unread response so callers can stream the body; the body
+    must be fully consumed before the connection can be reused.
+    """
+    for _ in range(max_redirects + 1):
+        parts = urlsplit(url)
+        host = parts.netloc
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+
+        conn = _connections.get(host)
+        if conn is None:
+            conn = HTTPSConnection(host, timeout=60)
+            _connections[host] = conn
+
+        try:
+            conn.request(method, path, headers=headers or {})
+            resp = conn.getresponse()
+        except (HTTPException, OSError):
+            # The server may have dropped an idle keep-alive connection;
+            # reconnect once and retry.
+            conn.close()
+            conn = HTTPSConnection(host, timeout=60)
+            _connections[host] = conn
+            conn.request(method, path, headers=headers or {})
+            resp = conn.getresponse()
+
+        if resp.status in (301, 302, 303, 307, 308):
+            location = resp.getheader("Location")
+            resp.read()  # Drain so the connection stays reusable.
+            if not location:
+                raise RuntimeError(f"Redirect without Location from {url}")
+            url = urljoin(url, location)
+            continue
+
+        if resp.status >= 400:
+            resp.read()
+            raise RuntimeError(f"HTTP {resp.status} fetching {url}")
+
+        return resp
+
+    raise RuntimeError(f"Too many redirects fetching {url}")
+
+
 def fetch_url(url: str) -> str:
     """Fetch a URL and return its content as text."""
-    with urlopen(url) as resp:
-        content_bytes = resp.read()
-    return content_bytes.decode("utf-8", errors="ignore")
+    resp = _http_get(url)
+    return resp.read().decode("utf-8", errors="ignore")
 
 
 def find_json_url(html: str) -> Optional[str]:
     """Extract the ServiceTags_Public_*.json URL from the HTML."""
-    match = re.search(JSON_URL_PATTERN, html)
-    if match:
-        return match.group(0)
+    # Cheap substring prefilter: without this literal no match is possible,
+    # so skip the regex scan over the whole page entirely.
+    if "ServiceTags_Public_" not in html:
+        return None
+
+    # Start the regex at the first download link rather than at offset 0.
+    start = html.find("https://download.microsoft.com/download/")
+    match = _JSON_URL_RE.search(html, start if start != -1 else 0)
+    return match.group(0) if match else None
+
+
+def guess_json_url(weeks: int = 3) -> Optional[str]:
+    """
+    Probe the stable weekly download path for the most recent Mondays with
+    cheap HEAD requests and return the first URL that exists, skipping the
+    HTML scrape entirely on the common path.
+    """
+    today = datetime.now(timezone.utc).date()
+    monday = today - timedelta(days=today.weekday())
+
+    for week in range(weeks):
+        stamp = (monday - timedelta(weeks=week)).strftime("%Y%m%d")
+        candidate = DIRECT_URL_TEMPLATE.format(stamp=stamp)
+        try:
+            resp = _http_get(candidate, method="HEAD")
+        except (RuntimeError, HTTPException, OSError):
+            continue
+        resp.read()  # HEAD has no body, but drain to keep the connection clean.
+        return candidate
+
     return None
 
 
-def download_servicetags_json(save_path: Optional[Path] = None) -> dict:
+def discover_json_url() -> str:
     """
-    Download the current ServiceTags_Public_*.json file by:
-      1. Fetching the Download Center details page
-      2. Falling back to the confirmation page (if needed)
-      3. Grabbing the first matching ServiceTags_Public_*.json download link
+    Locate the current ServiceTags_Public_*.json URL by:
+      1. Probing the stable weekly URL for recent Mondays (HEAD requests)
+      2. Falling back to scraping the Download Center details page
+      3. Falling back to the confirmation page (if needed)
     """
-    # Try details page first
-    html = fetch_url(DETAILS_URL)
-    json_url = find_json_url(html)
+    # Cheap direct probe first; scrape the HTML pages only on miss.
+    json_url = guess_json_url()
+
+    if not json_url:
+        html = fetch_url(DETAILS_URL)
+        json_url = find_json_url(html)
 
     if not json_url:
         # Fallback to confirmation page if needed
@@ -73,16 +199,80 @@ def download_servicetags_json(save_path: Optional[Path] = None) -> dict:
         )
 
     print(f"Found ServiceTags JSON URL: {json_url}", file=sys.stderr)
+    return json_url
 
-    with urlopen(json_url) as resp:
-        data_bytes = resp.read()
+
+def download_servicetags_file(
+    save_path: Optional[Path] = None, cached_etag: Optional[str] = None
+) -> Tuple[Optional[Path], bool, Optional[str]]:
+    """
+    Download the current ServiceTags_Public_*.json file to disk.
+    Returns (path, is_temporary, etag); temporary files are the caller's to
+    delete. When cached_etag matches upstream (HTTP 304), path is None and
+    nothing was downloaded.
+    """
+    json_url = discover_json_url()
+
+    # Stream the (tens-of-MB) body straight to disk in 1MB chunks rather than
+    # holding it all in memory, then parse from the file.
+    if save_path is not None:
+        json_path = save_path
+        is_temporary = False
+    else:
+        tmp_fh = tempfile.NamedTemporaryFile(suffix=".json", delete=False)
+        tmp_fh.close()
+        json_path = Path(tmp_fh.name)
+        is_temporary = True
+
+    # The JSON compresses ~5-7x; ask the CDN for gzip and decompress on
+    # the fly so the saved file stays plain JSON.
+    headers = {"Accept-Encoding": "gzip"}
+    if cached_etag:
+        headers["If-None-Match"] = cached_etag
+
+    resp = _http_get(json_url, headers=headers)
+    if resp.status == 304:
+        resp.read()  # Drain so the connection stays reusable.
+        if is_temporary:
+            json_path.unlink(missing_ok=True)
+        return None, False, cached_etag
+
+    etag = resp.headers.get("ETag")
+    with json_path.open("wb") as out_fh:
+        body = resp
+        if resp.headers.get("Content-Encoding") == "gzip":
+            body = gzip.GzipFile(fileobj=resp)
+        shutil.copyfileobj(body, out_fh, length=1024 * 1024)
 
     if save_path is not None:
-        save_path.write_bytes(data_bytes)
         print(f"Saved raw ServiceTags JSON to {save_path}", file=sys.stderr)
 
-    data = json.loads(data_bytes.decode("utf-8"))
-    return data
+    return json_path, is_temporary, etag
+
+
+def read_change_number(json_path: Path) -> Optional[int]:
+    """Cheaply read the top-level changeNumber without a full parse."""
+    with json_path.open("rb") as f:
+        head = f.read(4096)
+    match = _CHANGE_NUMBER_RE.search(head)
+    return int(match.group(1)) if match else None
+
+
+def iter_service_tags(json_path: Path, legacy_parse: bool = False) -> Iterable[dict]:
+    """
+    Yield service tag entries from the downloaded JSON one at a time.
+    Uses ijson to stream-parse when installed, so peak memory is bounded
+    by a single tag rather than the whole document; falls back to a full
+    parse otherwise (or when legacy_parse is set, for debugging).
+    """
+    if ijson is not None and not legacy_parse:
+        with json_path.open("rb") as f:
+            yield from ijson.items(f, "values.item")
+        return
+
+    with json_path.open("rb") as f:
+        root = _json_loads(f.read())
+    yield from extract_values(root)
 
 
 def extract_values(root: dict) -> List[dict]:
@@ -103,32 +293,71 @@ def normalise_filename(tag_name: str) -> str:
     return tag_name.replace(" ", "_")
 
 
-def split_prefixes_by_ip_version(prefixes: Iterable[str]) -> Tuple[List[str], List[str]]:
-    ipv4: List[str] = []
-    ipv6: List[str] = []
+def _v4_sort_key(pfx: str) -> Tuple[int, int, int]:
+    """Sort key for an a.b.c.d/n string: (ok, numeric address, prefixlen)."""
+    ip, _, plen = pfx.partition("/")
+    try:
+        a, b, c, d = ip.split(".")
+        addr = (int(a) << 24) | (int(b) << 16) | (int(c) << 8) | int(d)
+        return 0, addr, int(plen) if plen else 32
+    except ValueError:
+        return 1, 0, 0
 
-    for pfx in prefixes:
-        try:
-            network = ipaddress.ip_network(pfx, strict=False)
-        except ValueError:
-            # Skip unknown formats while still writing them to the combined file.
-            print(f"Skipping unrecognised address prefix: {pfx}", file=sys.stderr)
-            continue
 
-        if network.version == 4:
-            ipv4.append(pfx)
+def _v6_sort_key(pfx: str) -> Tuple[int, int, int]:
+    """Sort key for an IPv6 CIDR: (ok, numeric network address, prefixlen)."""
+    try:
+        network = ipaddress.IPv6Network(pfx, strict=False)
+        return 0, int(network.network_address), network.prefixlen
+    except ValueError:
+        return 1, 0, 0
+
+
+def _emit_one_tag(
+    name: str, prefixes: List[str], output_dir: Path
+) -> Tuple[str, str, Tuple[int, int, int]]:
+    """
+    Write the combined/-v4/-v6 files for one service tag in a single pass.
+    Returns (tag_name, base_filename, (total, ipv4, ipv6) counts).
+    """
+    base_name = normalise_filename(name)
+    base_path = output_dir / f"{base_name}.txt"
+    ipv4_path = output_dir / f"{base_name}-v4.txt"
+    ipv6_path = output_dir / f"{base_name}-v6.txt"
+
+    # Single pass: classify each prefix once, then write each file as
+    # one joined payload with a single write() call rather than one
+    # f.write per line. A ':' means IPv6, a '.' means IPv4; anything
+    # else goes to the combined file only.
+    ipv4_lines: List[str] = []
+    ipv6_lines: List[str] = []
+    other_lines: List[str] = []
+    for pfx in prefixes:
+        if ":" in pfx:
+            ipv6_lines.append(pfx)
+        elif "." in pfx:
+            ipv4_lines.append(pfx)
         else:
-            ipv6.append(pfx)
+            print(f"Skipping unrecognised address prefix: {pfx}", file=sys.stderr)
+            other_lines.append(pfx)
 
-    return ipv4, ipv6
+    # Emit in canonical numeric order rather than whatever order Microsoft
+    # shipped this week, so a reshuffled-but-identical feed produces no
+    # diff in the generated files.
+    ipv4_lines.sort(key=_v4_sort_key)
+    ipv6_lines.sort(key=_v6_sort_key)
+    base_lines = ipv4_lines + ipv6_lines + other_lines
 
+    for path, lines in (
+        (base_path, base_lines),
+        (ipv4_path, ipv4_lines),
+        (ipv6_path, ipv6_lines),
+    ):
+        payload = "\n".join(lines) + "\n" if lines else ""
+        path.write_text(payload, encoding="utf-8")
 
-def write_prefix_file(path: Path, prefixes: Iterable[str]) -> int:
-    prefixes_list = list(prefixes)
-    with path.open("w", encoding="utf-8") as f:
-        for pfx in prefixes_list:
-            f.write(f"{pfx}\n")
-    return len(prefixes_list)
+    counts = (len(base_lines), len(ipv4_lines), len(ipv6_lines))
+    return name, base_name, counts
 
 
 def build_edls(
@@ -142,8 +371,18 @@ def build_edls(
     Returns a list of (tag_name, base_filename) entries.
     """
     output_dir.mkdir(parents=True, exist_ok=True)
-    written_entries: List[Tuple[str, str]] = []
 
+    # Sets give O(1) membership in the per-tag filter below; the CLI hands
+    # us lists.
+    inc = frozenset(include_tags) if include_tags else None
+    exc = frozenset(exclude_tags) if exclude_tags else None
+
+    # Regional tags repeat the same CIDR strings many times over (e.g.
+    # AzureCloud.eastus vs AzureCloud); map duplicates onto one shared str
+    # object so the parse tree doesn't hold thousands of identical copies.
+    pool: Dict[str, str] = {}
+
+    tasks: List[Tuple[str, List[str]]] = []
     for tag in values:
         name = tag.get("name")
         props = tag.get("properties", {})
@@ -152,29 +391,177 @@ def build_edls(
         if not name or not prefixes:
             continue
 
-        if include_tags and name not in include_tags:
+        if inc is not None and name not in inc:
             continue
-        if exclude_tags and name in exclude_tags:
+        if exc is not None and name in exc:
             continue
 
-        base_name = normalise_filename(name)
-        base_path = output_dir / f"{base_name}.txt"
-        ipv4_path = output_dir / f"{base_name}-v4.txt"
-        ipv6_path = output_dir / f"{base_name}-v6.txt"
+        tasks.append((name, [pool.setdefault(p, p) for p in prefixes]))
 
-        total_count = write_prefix_file(base_path, prefixes)
-        ipv4_prefixes, ipv6_prefixes = split_prefixes_by_ip_version(prefixes)
-        ipv4_count = write_prefix_file(ipv4_path, ipv4_prefixes)
-        ipv6_count = write_prefix_file(ipv6_path, ipv6_prefixes)
+    # The per-tag work is independent and file-I/O bound (the GIL is
+    # released during OS writes), so fan the tags out across threads.
+    # Per-tag log lines are accumulated and flushed in one stderr write at
+    # the end: stderr is unbuffered/line-buffered, so printing inside the
+    # loop would cost a syscall per tag.
+    written_entries: List[Tuple[str, str]] = []
+    log_lines: List[str] = []
+    if tasks:
+        max_workers = min(32, (os.cpu_count() or 1) * 4)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(_emit_one_tag, name, prefixes, output_dir)
+                for name, prefixes in tasks
+            ]
+            for future in futures:
+                name, base_name, (total_count, ipv4_count, ipv6_count) = future.result()
+                written_entries.append((name, base_name))
+                log_lines.append(
+                    f"Wrote {output_dir / (base_name + '.txt')} "
+                    f"(total={total_count}, v4={ipv4_count}, v6={ipv6_count})"
+                )
+
+    if log_lines:
+        sys.stderr.write("\n".join(log_lines) + "\n")
 
-        written_entries.append((name, base_name))
+    return written_entries
 
-        print(
-            f"Wrote {base_path} (total={total_count}, v4={ipv4_count}, v6={ipv6_count})",
-            file=sys.stderr,
-        )
 
-    return written_entries
+class _TeeReader:
+    """File-like wrapper that copies everything read through it to a sink."""
+
+    def __init__(self, source, sink):
+        self._source = source
+        self._sink = sink
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._source.read(size)
+        if chunk:
+            self._sink.write(chunk)
+        return chunk
+
+
+def pipeline(
+    output_dir: Path,
+    include_tags: Optional[List[str]] = None,
+    exclude_tags: Optional[List[str]] = None,
+    save_path: Optional[Path] = None,
+    cached_etag: Optional[str] = None,
+) -> Tuple[Optional[List[Tuple[str, str]]], Optional[str]]:
+    """
+    Stream the ServiceTags download through gzip decompression, ijson
+    parsing and the per-tag writers in a single pass, so no more than one
+    tag is ever held in memory and the network, parse and write stages
+    overlap. Requires ijson. Returns (entries, etag); entries is None when
+    upstream answered 304 for cached_etag.
+    """
+    json_url = discover_json_url()
+
+    headers = {"Accept-Encoding": "gzip"}
+    if cached_etag:
+        headers["If-None-Match"] = cached_etag
+
+    resp = _http_get(json_url, headers=headers)
+    if resp.status == 304:
+        resp.read()  # Drain so the connection stays reusable.
+        return None, cached_etag
+
+    etag = resp.headers.get("ETag")
+    body = resp
+    if resp.headers.get("Content-Encoding") == "gzip":
+        body = gzip.GzipFile(fileobj=resp)
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    inc = frozenset(include_tags) if include_tags else None
+    exc = frozenset(exclude_tags) if exclude_tags else None
+
+    written_entries: List[Tuple[str, str]] = []
+    log_lines: List[str] = []
+
+    save_fh = save_path.open("wb") if save_path is not None else None
+    if save_fh is not None:
+        body = _TeeReader(body, save_fh)
+
+    try:
+        for tag in ijson.items(body, "values.item"):
+            name = tag.get("name")
+            props = tag.get("properties", {})
+            prefixes = props.get("addressPrefixes", [])
+
+            if not name or not prefixes:
+                continue
+            if inc is not None and name not in inc:
+                continue
+            if exc is not None and name in exc:
+                continue
+
+            name, base_name, (total_count, ipv4_count, ipv6_count) = _emit_one_tag(
+                name, prefixes, output_dir
+            )
+            written_entries.append((name, base_name))
+            log_lines.append(
+                f"Wrote {output_dir / (base_name + '.txt')} "
+                f"(total={total_count}, v4={ipv4_count}, v6={ipv6_count})"
+            )
+    finally:
+        if save_fh is not None:
+            save_fh.close()
+
+    if save_path is not None:
+        print(f"Saved raw ServiceTags JSON to {save_path}", file=sys.stderr)
+    if log_lines:
+        sys.stderr.write("\n".join(log_lines) + "\n")
+
+    return written_entries, etag
+
+
+def write_bundle(output_dir: Path) -> Path:
+    """
+    Pack all generated .txt files into a single edls.tar.gz so consumers
+    can pull one compressed artifact instead of hundreds of small files.
+    A bundle.sha256 checksum is written alongside; returns the bundle path.
+    """
+    bundle_path = output_dir / "edls.tar.gz"
+    with tarfile.open(bundle_path, "w:gz", compresslevel=6) as tar:
+        with os.scandir(output_dir) as it:
+            for entry in sorted(it, key=lambda e: e.name):
+                if entry.is_file() and entry.name.endswith(".txt"):
+                    tar.add(entry.path, arcname=entry.name)
+
+    with bundle_path.open("rb") as f:
+        digest = hashlib.file_digest(f, "sha256").hexdigest()
+    (output_dir / "bundle.sha256").write_text(
+        f"{digest}  {bundle_path.name}\n", encoding="utf-8"
+    )
+
+    print(f"Wrote bundle to {bundle_path}", file=sys.stderr)
+    return bundle_path
+
+
+def write_compact(
+    entries: Iterable[Tuple[str, str]], output_dir: Path
+) -> Path:
+    """
+    Write a single gzipped JSONL file ({"name", "v4", "v6"} per line) next
+    to the per-tag files. One compressed artifact is far cheaper to store,
+    sync and fetch than tag_count x 3 small files, and gzip compresses the
+    heavy cross-tag prefix duplication well. Returns the compact path.
+    """
+    compact_path = output_dir / "servicetags.jsonl.gz"
+    with gzip.open(compact_path, "wt", encoding="utf-8") as f:
+        for name, base_name in sorted(entries, key=lambda item: item[0].lower()):
+            obj = {
+                "name": name,
+                "v4": (output_dir / f"{base_name}-v4.txt")
+                .read_text(encoding="utf-8")
+                .split(),
+                "v6": (output_dir / f"{base_name}-v6.txt")
+                .read_text(encoding="utf-8")
+                .split(),
+            }
+            f.write(json.dumps(obj, separators=(",", ":")) + "\n")
+
+    print(f"Wrote compact JSONL to {compact_path}", file=sys.stderr)
+    return compact_path
 
 
 def write_url_index(
@@ -224,11 +611,34 @@ def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
         nargs="+",
         help="Optional list of service tag names to exclude.",
     )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild even if the upstream changeNumber/ETag is unchanged.",
+    )
+    parser.add_argument(
+        "--legacy-parse",
+        action="store_true",
+        help="Parse the whole JSON document up front instead of streaming it.",
+    )
     parser.add_argument(
         "--save-json",
         metavar="PATH",
         help="Optional path to also save the raw ServiceTags_Public JSON file.",
     )
+    parser.add_argument(
+        "--bundle",
+        action="store_true",
+        help="Also pack the generated .txt files into <output_dir>/edls.tar.gz.",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help=(
+            "Also write a single gzipped JSONL of all tags to "
+            "<output_dir>/servicetags.jsonl.gz."
+        ),
+    )
     parser.add_argument(
         "--url-index",
         metavar="PATH",
@@ -251,15 +661,72 @@ def main(argv: Optional[List[str]] = None) -> int:
     output_dir = Path(args.output_dir)
     save_json_path = Path(args.save_json) if args.save_json else None
 
-    root = download_servicetags_json(save_path=save_json_path)
-    values = extract_values(root)
+    # Change-detection state lives alongside the EDLs so the CI commit
+    # carries it between runs.
+    etag_path = output_dir / ".etag"
+    change_path = output_dir / ".changeNumber"
+
+    cached_etag = None
+    if not args.force and etag_path.exists():
+        cached_etag = etag_path.read_text(encoding="utf-8").strip() or None
+
+    if ijson is not None and not args.legacy_parse:
+        # Fused path: download, decompress, parse and write in one
+        # streaming pass without an intermediate full parse tree. The
+        # changeNumber can only be read back from the saved file here; the
+        # ETag check already provides the early exit.
+        entries, etag = pipeline(
+            output_dir=output_dir,
+            include_tags=args.include_tags,
+            exclude_tags=args.exclude_tags,
+            save_path=save_json_path,
+            cached_etag=cached_etag,
+        )
+        if entries is None:
+            print(
+                "ServiceTags JSON unchanged upstream (HTTP 304); nothing to do.",
+                file=sys.stderr,
+            )
+            return 0
+        change_number = (
+            read_change_number(save_json_path) if save_json_path is not None else None
+        )
+    else:
+        json_path, is_temporary, etag = download_servicetags_file(
+            save_path=save_json_path, cached_etag=cached_etag
+        )
+        if json_path is None:
+            print(
+                "ServiceTags JSON unchanged upstream (HTTP 304); nothing to do.",
+                file=sys.stderr,
+            )
+            return 0
 
-    entries = build_edls(
-        values,
-        output_dir=output_dir,
-        include_tags=args.include_tags,
-        exclude_tags=args.exclude_tags,
-    )
+        try:
+            change_number = read_change_number(json_path)
+            if not args.force and change_number is not None and change_path.exists():
+                try:
+                    previous = int(change_path.read_text(encoding="utf-8").strip())
+                except ValueError:
+                    previous = None
+                if previous == change_number:
+                    print(
+                        f"changeNumber {change_number} unchanged; skipping rebuild.",
+                        file=sys.stderr,
+                    )
+                    return 0
+
+            values = iter_service_tags(json_path, legacy_parse=args.legacy_parse)
+
+            entries = build_edls(
+                values,
+                output_dir=output_dir,
+                include_tags=args.include_tags,
+                exclude_tags=args.exclude_tags,
+            )
+        finally:
+            if is_temporary:
+                json_path.unlink(missing_ok=True)
 
     if args.url_index:
         index_path = Path(args.url_index)
@@ -270,6 +737,17 @@ def main(argv: Optional[List[str]] = None) -> int:
             index_path=index_path,
         )
 
+    if args.compact:
+        write_compact(entries, output_dir)
+
+    if args.bundle:
+        write_bundle(output_dir)
+
+    if change_number is not None:
+        change_path.write_text(f"{change_number}\n", encoding="utf-8")
+    if etag:
+        etag_path.write_text(f"{etag}\n", encoding="utf-8")
+
     return 0
 
 